@@ -1,26 +1,30 @@
+import asyncio
 import inspect
 import json
 import linecache
 import os
 import re
 import subprocess
-import threading
+import sys
 from functools import wraps, partial
-from typing import List, Dict, Any, Union  # noqa: F401
+from typing import List, Dict, Any, Union, Tuple  # noqa: F401
 
 import neovim
 
-from .RPC import RPC
+from .RPC import RPCProtocol
 from .Sign import Sign
 from .TextDocumentItem import TextDocumentItem
+from .TextDocumentSyncKind import TextDocumentSyncKind
 from .logger import logger, logpath_server, setLoggingLevel
 from .state import (
-    state, update_state, execute_command, echo, echomsg, echoerr,
-    echo_ellipsis, echo_signature, make_serializable, set_state, alive)
+    state, update_state, execute_command, call_atomic, echo, echomsg, echoerr,
+    echo_ellipsis, echo_signature, make_serializable, set_state, alive, wait_for)
 from .util import (
-    get_rootPath, path_to_uri, uri_to_path, get_command_goto_file, get_command_update_signs,
+    get_rootPath, path_to_uri, uri_to_path, get_command_goto_file, get_command_set_cursor,
+    get_command_update_signs,
     convert_vim_command_args_to_kwargs, apply_TextEdit, markedString_to_str,
-    convert_lsp_completion_item_to_vim_style)
+    convert_lsp_completion_item_to_vim_style, get_TextDocumentSyncKind, json_dumps,
+    convert_TextEdit_to_buf_set_text_args, read_file_lines)
 from .MessageType import MessageType
 from .DiagnosticSeverity import DiagnosticSeverity
 from .CommandsClient import CommandsClient
@@ -77,28 +81,39 @@ def gather_args(keys: List, args: List = [], kwargs: Dict = {}) -> List:
     res.update(kwargs)
 
     cursor = []  # type: List[int]
+    # Current buffer info kept up to date by autocmds, saves a request each.
+    currentBuffer = state["buffers"].get(state["currentBufnr"], {})
 
     for k in keys:
         if res[k] is not None:
             continue
         elif k == "languageId":
-            res[k] = state["nvim"].current.buffer.options["filetype"]
+            res[k] = currentBuffer.get("languageId")
+            if res[k] is None:
+                res[k] = state["nvim"].request("nvim_buf_get_option", 0, "filetype")
         elif k == "buftype":
-            res[k] = state["nvim"].current.buffer.options["buftype"]
+            res[k] = currentBuffer.get("buftype")
+            if res[k] is None:
+                res[k] = state["nvim"].request("nvim_buf_get_option", 0, "buftype")
         elif k == "uri":
-            filename = kwargs.get("filename") or state["nvim"].current.buffer.name
+            filename = (kwargs.get("filename") or currentBuffer.get("filename") or
+                        state["nvim"].request("nvim_buf_get_name", 0))
             res[k] = path_to_uri(filename)
         elif k == "line":
-            cursor = state["nvim"].current.window.cursor
+            cursor = state["nvim"].request("nvim_win_get_cursor", 0)
             res[k] = cursor[0] - 1
         elif k == "character":
             res[k] = cursor[1]
+        elif k == "bufnr":
+            res[k] = currentBuffer.get("bufnr")
+            if res[k] is None:
+                res[k] = state["nvim"].request("nvim_get_current_buf").number
         elif k == "cword":
-            res[k] = state["nvim"].funcs.expand("<cword>")
+            res[k] = state["nvim"].request("nvim_call_function", "expand", ["<cword>"])
         elif k == "bufnames":
-            res[k] = [b.name for b in state["nvim"].buffers]
+            res[k] = list(get_buffers().keys())
         elif k == "columns":
-            res[k] = state["nvim"].options["columns"]
+            res[k] = state["nvim"].request("nvim_get_option", "columns")
         else:
             logger.warn("Unknown parameter key: " + k)
 
@@ -140,27 +155,103 @@ def sync_settings() -> None:
         })
 
 
-def get_current_buffer_text() -> str:
-    text = str.join("\n", state["nvim"].current.buffer)
-    if state["nvim"].current.buffer.options["endofline"]:
+def attach_child_watcher(loop) -> None:
+    """
+    Make sure server process exit is reported to loop. Called once, as watchers
+    are process-global and shared with other remote plugins of the host.
+
+    Like neovim client's own child process spawning. Only the default watcher
+    before python 3.8 needs a loop; later ones wait on each child in a thread,
+    or on its pidfd (3.12+), and the API is gone in 3.14.
+    """
+    if sys.version_info < (3, 8):
+        asyncio.get_child_watcher().attach_loop(loop)
+
+
+def get_buffer_text(bufnr: int) -> str:
+    # Fetch lines and 'endofline' in one request.
+    (lines, endofline), _ = state["nvim"].request("nvim_call_atomic", [
+        ["nvim_buf_get_lines", [bufnr, 0, -1, True]],
+        ["nvim_buf_get_option", [bufnr, "endofline"]],
+    ])
+    text = str.join("\n", lines)
+    if endofline:
+        text += "\n"
+    return text
+
+
+def attach_buffer(bufnr: int) -> str:
+    """
+    Subscribe to nvim_buf_lines_event of buffer.
+
+    Return text at the moment of attaching, taken in the same atomic request
+    so no change is missed. None if attaching failed.
+    """
+    results, error = state["nvim"].request("nvim_call_atomic", [
+        ["nvim_buf_attach", [bufnr, False, {}]],
+        ["nvim_buf_get_lines", [bufnr, 0, -1, True]],
+        ["nvim_buf_get_option", [bufnr, "endofline"]],
+    ])
+    if error is not None or not results[0]:
+        logger.info("nvim_buf_attach failed: " + str(error))
+        return None
+    _, lines, endofline = results
+    text = str.join("\n", lines)
+    if endofline:
         text += "\n"
     return text
 
 
-def get_file_line(filepath: str, line: int) -> str:
-    modified_buffers = [buffer for buffer in state["nvim"].buffers
-                        if buffer.name == filepath and
-                        buffer.options["mod"]]
+def get_buffers() -> Dict[str, Any]:
+    """
+    Map of buffer name to buffer, fetched in two requests regardless of the
+    number of buffers.
+    """
+    buffers = state["nvim"].request("nvim_list_bufs")
+    names, _ = state["nvim"].request("nvim_call_atomic", [
+        ["nvim_buf_get_name", [buffer]] for buffer in buffers])
+    return dict(zip(names, buffers))
+
+
+def get_modified_buffers() -> Dict[str, Any]:
+    """
+    Map of buffer name to buffer, for buffers with unsaved changes.
+    """
+    buffers = get_buffers()
+    modified, _ = state["nvim"].request("nvim_call_atomic", [
+        ["nvim_buf_get_option", [buffer, "modified"]] for buffer in buffers.values()])
+    return {name: buffer for (name, buffer), mod in zip(buffers.items(), modified)
+            if mod}
+
+
+def get_file_line(filepath: str, line: int, modified_buffers: Dict = None) -> str:
+    if modified_buffers is None:
+        modified_buffers = get_modified_buffers()
 
-    if len(modified_buffers) == 0:
+    buffer = modified_buffers.get(filepath)
+    if buffer is None:
         return linecache.getline(filepath, line).strip()
     else:
-        return modified_buffers[0][line - 1]
+        return buffer[line - 1]
 
 
-def apply_TextDocumentEdit(textDocumentEdit: Dict) -> None:
+def has_buf_set_text() -> bool:
     """
-    Apply a TextDocumentEdit.
+    Whether nvim_buf_set_text is available (neovim 0.5 and later).
+    """
+    if state["hasBufSetText"] is None:
+        update_state({
+            "hasBufSetText": state["nvim"].funcs.exists("*nvim_buf_set_text") == 1,
+        })
+    return state["hasBufSetText"]
+
+
+def get_calls_apply_TextDocumentEdit(textDocumentEdit: Dict, buffer: Any = None,
+                                     text: List[str] = None) -> List:
+    """
+    Compute nvim API calls that apply a TextDocumentEdit.
+
+    `buffer` and its current `text` are looked up when not given.
     """
     filename = uri_to_path(textDocumentEdit["textDocument"]["uri"])
     edits = textDocumentEdit["edits"]
@@ -169,48 +260,103 @@ def apply_TextDocumentEdit(textDocumentEdit: Dict) -> None:
         -1 * edit["range"]["start"]["line"],
         -1 * edit["range"]["start"]["character"],
     ))
-    buffer = next((buffer for buffer in state["nvim"].buffers
-                   if buffer.name == filename), None)
+    if buffer is None:
+        buffer = get_buffers().get(filename)
+        if buffer is not None and not state["nvim"].request("nvim_buf_is_loaded", buffer):
+            buffer = None
     # Open file if needed.
     if buffer is None:
         state["nvim"].command("exe 'edit ' . fnameescape('{}')".format(filename))
-        buffer = next((buffer for buffer in state["nvim"].buffers
-                       if buffer.name == filename), None)
-    text = buffer[:]
+        buffer = state["nvim"].request("nvim_get_current_buf")
+    if text is None:
+        text = buffer[:]
+    if has_buf_set_text():
+        # Edits are applied in place, bottom up, keeping marks and undo tidy.
+        return [["nvim_buf_set_text",
+                 [buffer] + convert_TextEdit_to_buf_set_text_args(text, edit)]
+                for edit in edits]
     for edit in edits:
         text = apply_TextEdit(text, edit)
     if buffer.options["fixendofline"] and text[-1] == "":
-        buffer[:] = text[:-1]
-    else:
-        buffer[:] = text
+        text = text[:-1]
+    return [["nvim_buf_set_lines", [buffer, 0, -1, True, text]]]
 
 
-def apply_WorkspaceEdit(workspaceEdit: Dict) -> None:
+def apply_TextDocumentEdit(textDocumentEdit: Dict, calls: List = []) -> None:
     """
-    Apply a WorkspaceEdit.
+    Apply a TextDocumentEdit.
+
+    `calls` are extra nvim API calls sent in the same batch after the edit.
     """
-    logger.info("Begin apply_WorkspaceEdit " + str(workspaceEdit))
-    if workspaceEdit.get("documentChanges") is not None:
-        for textDocumentEdit in workspaceEdit.get("documentChanges"):
-            apply_TextDocumentEdit(textDocumentEdit)
-    else:
-        for (uri, edits) in workspaceEdit["changes"].items():
-            textDocumentEdit = {
-                "textDocument": {
-                    "uri": uri,
-                },
-                "edits": edits,
-            }
-            apply_TextDocumentEdit(textDocumentEdit)
+    call_atomic(get_calls_apply_TextDocumentEdit(textDocumentEdit) + calls, warn=True)
 
 
-def set_cursor(uri: str, line: int, character: int) -> None:
+def apply_WorkspaceEdit(workspaceEdit: Dict, calls: List = []) -> None:
     """
-    Set cursor position.
+    Apply a WorkspaceEdit.
+
+    Edits of all documents are sent to nvim in one batch, followed by `calls`.
     """
-    cmd = "buffer {} | normal! {}G{}|".format(
-        uri_to_path(uri), line + 1, character + 1)
-    execute_command(cmd)
+    logger.info("Begin apply_WorkspaceEdit " + str(workspaceEdit))
+    textDocumentEdits = workspaceEdit.get("documentChanges")
+    if textDocumentEdits is None:
+        textDocumentEdits = [{
+            "textDocument": {
+                "uri": uri,
+            },
+            "edits": edits,
+        } for (uri, edits) in workspaceEdit["changes"].items()]
+    buffers = get_buffers()
+    texts = {}  # type: Dict[str, List[str]]
+    edit_calls = []  # type: List
+    if has_buf_set_text():
+        # Files not open yet are read off the event loop, then loaded into
+        # hidden buffers by the same batch that edits them.
+        filenames = set(uri_to_path(textDocumentEdit["textDocument"]["uri"])
+                        for textDocumentEdit in textDocumentEdits)
+        # Listed but unloaded buffers have no lines yet.
+        opened = [filename for filename in filenames if filename in buffers]
+        loaded, _ = state["nvim"].request("nvim_call_atomic", [
+            ["nvim_buf_is_loaded", [buffers[filename]]] for filename in opened])
+        for filename, is_loaded in zip(opened, loaded):
+            if not is_loaded:
+                del buffers[filename]
+        texts = read_files([filename for filename in filenames
+                            if filename not in buffers])
+        bufnrs, _ = state["nvim"].request("nvim_call_atomic", [
+            ["nvim_call_function", ["bufadd", [filename]]] for filename in texts])
+        for filename, bufnr in zip(texts, bufnrs):
+            buffers[filename] = bufnr
+            edit_calls += [
+                ["nvim_call_function", ["bufload", [bufnr]]],
+                ["nvim_buf_set_option", [bufnr, "buflisted", True]],
+            ]
+    for textDocumentEdit in textDocumentEdits:
+        filename = uri_to_path(textDocumentEdit["textDocument"]["uri"])
+        edit_calls += get_calls_apply_TextDocumentEdit(
+            textDocumentEdit, buffers.get(filename), texts.get(filename))
+    call_atomic(edit_calls + calls, warn=True)
+
+
+def read_files(filenames: List[str]) -> Dict[str, List[str]]:
+    """
+    Read files concurrently in the loop's default executor.
+
+    Files failing to read are left out, they are opened in nvim instead.
+    """
+    if len(filenames) == 0:
+        return {}
+    loop = state["nvim"].loop
+    texts = wait_for(asyncio.gather(*[
+        loop.run_in_executor(None, read_file_lines, filename)
+        for filename in filenames], return_exceptions=True))
+    result = {}  # type: Dict[str, List[str]]
+    for filename, text in zip(filenames, texts):
+        if isinstance(text, Exception):
+            logger.warn("Failed to read {}: {}".format(filename, text))
+        else:
+            result[filename] = text
+    return result
 
 
 def define_signs() -> None:
@@ -231,21 +377,20 @@ def fzf(source: List, sink: str) -> None:
     """
     Start fzf selection.
     """
-    execute_command("""
-call fzf#run(fzf#wrap({{
-'source': {},
-'sink': function('{}')
-}}))
-""".replace("\n", "").format(json.dumps(source), sink))
+    source_json = json_dumps(source).decode("UTF-8")
+    execute_command(
+        "call fzf#run(fzf#wrap({{'source': {}, 'sink': function('{}')}}))".format(
+            source_json, sink))
     state["nvim"].feedkeys("i")
 
 
 def show_diagnostics(uri: str, diagnostics: List) -> None:
     """
-    Show diagnostics.
+    Show diagnostics of current buffer.
+
+    Highlights, signs and diagnostics list are updated in one batch.
     """
     path = uri_to_path(uri)
-    buffer = state["nvim"].current.buffer
 
     if state.get(uri, {}).get("highlight_source_id") is None:
         update_state({
@@ -254,7 +399,7 @@ def show_diagnostics(uri: str, diagnostics: List) -> None:
             }
         })
     highlight_source_id = state[uri]["highlight_source_id"]
-    buffer.clear_highlight(highlight_source_id)
+    calls = [["nvim_buf_clear_highlight", [0, highlight_source_id, 0, -1]]]
     signs = []
     qflist = []
     for entry in diagnostics:
@@ -264,9 +409,9 @@ def show_diagnostics(uri: str, diagnostics: List) -> None:
         severity = DiagnosticSeverity(entry.get("severity", 3))
         display = state["diagnosticsDisplay"][severity.value]
         text_highlight = display["texthl"]
-        buffer.add_highlight(text_highlight, start_line,
-                             start_character, end_character,
-                             highlight_source_id)
+        calls.append(["nvim_buf_add_highlight", [
+            0, highlight_source_id, text_highlight, start_line,
+            start_character, end_character]])
 
         signs.append(Sign(start_line + 1, severity))
 
@@ -279,15 +424,17 @@ def show_diagnostics(uri: str, diagnostics: List) -> None:
             "type": DiagnosticSeverity(severity.value).name,
         })
 
+    if state["diagnosticsList"] == "quickfix":
+        calls.append(["nvim_call_function", ["setqflist", [qflist]]])
+    elif state["diagnosticsList"] == "location":
+        calls.append(["nvim_call_function", ["setloclist", [0, qflist]]])
+
     signs = sorted(set(signs))
     cmd = get_command_update_signs(state[uri].get("signs", []), signs, path)
-    execute_command(cmd)
+    calls.append(["nvim_command", [cmd]])
     set_state([uri, "signs"], signs)
 
-    if state["diagnosticsList"] == "quickfix":
-        state["nvim"].funcs.setqflist(qflist)
-    elif state["diagnosticsList"] == "location":
-        state["nvim"].funcs.setloclist(0, qflist)
+    call_atomic(calls)
 
 
 def show_line_diagnostic(uri: str, line: int, columns: int) -> None:
@@ -302,6 +449,15 @@ def show_line_diagnostic(uri: str, line: int, columns: int) -> None:
     echo_ellipsis(entry, columns)
 
 
+# Info of the buffer an autocmd is triggered for, which is not necessarily
+# the current one, e.g., with bufload() or setbufvar().
+EVAL_AUTOCMD_BUFFER = (
+    "[{'bufnr': +expand('<abuf>'), "
+    "'buftype': getbufvar(+expand('<abuf>'), '&buftype'), "
+    "'languageId': getbufvar(+expand('<abuf>'), '&filetype'), "
+    "'filename': expand('#' . expand('<abuf>') . ':p')}]")
+
+
 @neovim.plugin
 class LanguageClient:
     _instance = None  # type: LanguageClient
@@ -311,6 +467,18 @@ class LanguageClient:
         type(self)._instance = self
 
         self.nvim = nvim
+        attach_child_watcher(nvim.loop)
+        # Handlers of requests and notifications from server.
+        self.handlers = {
+            "textDocument/publishDiagnostics": self.textDocument_publishDiagnostics,
+            "telemetry/event": self.telemetry_event,
+            "window/logMessage": self.window_logMessage,
+            "language/status": self.language_status,
+            "rustDocument/beginBuild": self.rustDocument_beginBuild,
+            "rustDocument/diagnosticsBegin": self.rustDocument_diagnosticsBegin,
+            "rustDocument/diagnosticsEnd": self.rustDocument_diagnosticsEnd,
+            "workspace/applyEdit": self.workspace_applyEdit,
+        }
         update_state({
             "nvim": nvim,
         })
@@ -371,22 +539,21 @@ class LanguageClient:
         command = [os.path.expandvars(os.path.expanduser(cmd))
                    for cmd in command]
 
+        loop = state["nvim"].loop
         try:
-            proc = subprocess.Popen(
-                # ["/bin/bash", "/tmp/wrapper.sh"],
-                command,
+            proc, protocol = wait_for(loop.subprocess_exec(
+                lambda: RPCProtocol(self.handle_request_and_notify, languageId),
+                *command,
                 stdin=subprocess.PIPE,
                 stdout=subprocess.PIPE,
-                stderr=open(logpath_server, "wb"))
+                stderr=open(logpath_server, "wb")))
         except Exception as ex:
             msg = "Failed to start language server: " + ex.args[1]
             logger.exception(msg)
             echoerr(msg)
             return
 
-        rpc = RPC(proc.stdout, proc.stdin, self.handle_request_and_notify, languageId)
-        thread = threading.Thread(target=rpc.serve, name="RPC-" + languageId, daemon=True)
-        thread.start()
+        rpc = protocol.rpc
 
         update_state({
             "servers": {
@@ -511,13 +678,48 @@ class LanguageClient:
             logger.warn("register completion manager source failed. Error: " +
                         repr(ex))
 
-    @neovim.autocmd(
-        "BufReadPost", pattern="*",
-        eval="[{'buftype': &buftype, 'languageId': &filetype, 'filename': expand('%:p')}]")
+    @neovim.autocmd("BufEnter", pattern="*", eval=EVAL_AUTOCMD_BUFFER)
+    def handle_BufEnter(self, args: List) -> None:
+        update_state({
+            "buffers": {args[0]["bufnr"]: args[0]},
+            "currentBufnr": args[0]["bufnr"],
+        })
+        if args[0]["filename"]:
+            self.reset_changedtick(path_to_uri(args[0]["filename"]))
+
+    def reset_changedtick(self, uri: str) -> None:
+        """
+        Forget b:changedtick of a document's last sync. A wiped and reloaded
+        buffer starts counting again, and may hit the same tick.
+        """
+        doc = state.get(uri, {}).get("textDocument")
+        if doc is not None:
+            doc.changedtick = None
+
+    @neovim.autocmd("FileType", pattern="*", eval=EVAL_AUTOCMD_BUFFER)
+    def handle_FileType(self, args: List) -> None:
+        update_state({"buffers": {args[0]["bufnr"]: args[0]}})
+
+    @neovim.autocmd("BufFilePost", pattern="*", eval=EVAL_AUTOCMD_BUFFER)
+    def handle_BufFilePost(self, args: List) -> None:
+        update_state({"buffers": {args[0]["bufnr"]: args[0]}})
+
+    # <abuf> is not set for OptionSet, the buffer is made current instead.
+    @neovim.autocmd("OptionSet", pattern="buftype", eval=EVAL_AUTOCMD_BUFFER.replace(
+        "expand('<abuf>')", "bufnr('%')"))
+    def handle_OptionSet_buftype(self, args: List) -> None:
+        update_state({"buffers": {args[0]["bufnr"]: args[0]}})
+
+    @neovim.autocmd("BufReadPost", pattern="*", eval=EVAL_AUTOCMD_BUFFER)
     def handle_BufReadPost(self, args: List) -> None:
         logger.info("Begin handle BufReadPost")
 
-        buftype, languageId, uri = gather_args(["buftype", "languageId", "uri"], args=args)
+        # Buffer read is not necessarily current, e.g., with bufload().
+        bufnr = args[0]["bufnr"]
+        buftype = args[0]["buftype"]
+        languageId = args[0]["languageId"]
+        uri = path_to_uri(args[0]["filename"]) if args[0]["filename"] else None
+        update_state({"buffers": {bufnr: args[0]}})
         if buftype != "" or not uri:
             return
         # Language server is running but file is not within rootUri.
@@ -526,25 +728,38 @@ class LanguageClient:
             return
         # Opened before.
         if state.get(uri, {}).get("textDocument") is not None:
+            self.reset_changedtick(uri)
             return
 
+        current = bufnr == state["nvim"].request("nvim_get_current_buf").number
         if alive(languageId, warn=False):
-            self.textDocument_didOpen(uri=uri, languageId=languageId)
-            show_diagnostics(uri, state.get(uri, {}).get("diagnostics", []))
-            line, columns = gather_args(["line", "columns"])
-            show_line_diagnostic(uri, line, columns)
-        elif state["autoStart"]:
+            self.textDocument_didOpen(uri=uri, languageId=languageId, bufnr=bufnr)
+            if current:
+                show_diagnostics(uri, state.get(uri, {}).get("diagnostics", []))
+                line, columns = gather_args(["line", "columns"])
+                show_line_diagnostic(uri, line, columns)
+        elif state["autoStart"] and current:
             self.start(warn=False)
 
         logger.info("End handleBufReadPost")
 
     @deco_args(warn=False)
-    def textDocument_didOpen(self, uri: str, languageId: str) -> None:
+    def textDocument_didOpen(self, uri: str, languageId: str, bufnr: int) -> None:
         logger.info("Begin textDocument/didOpen")
 
-        text = get_current_buffer_text()
+        text = None
+        capabilities = state["capabilities"].get(languageId, {})
+        if get_TextDocumentSyncKind(capabilities) == TextDocumentSyncKind.Incremental:
+            text = attach_buffer(bufnr)
+        attached = text is not None
+
+        if attached:
+            update_state({"attachedBuffers": {bufnr: uri}})
+        else:
+            text = get_buffer_text(bufnr)
 
         textDocumentItem = TextDocumentItem(uri, languageId, text)
+        textDocumentItem.attached = attached
         set_state([uri, "textDocument"], textDocumentItem)
 
         state["rpcs"][languageId].notify("textDocument/didOpen", {
@@ -556,7 +771,8 @@ class LanguageClient:
             }
         })
 
-        state["nvim"].current.buffer.options["omnifunc"] = "LanguageClient#complete"
+        state["nvim"].request("nvim_buf_set_option", bufnr, "omnifunc",
+                              "LanguageClient#complete")
 
         logger.info("End textDocument/didOpen")
 
@@ -709,8 +925,9 @@ class LanguageClient:
         if workspaceEdit is None or not handle:
             return workspaceEdit
 
-        apply_WorkspaceEdit(workspaceEdit)
-        set_cursor(uri, line, character)
+        apply_WorkspaceEdit(workspaceEdit, [
+            ["nvim_command", [get_command_set_cursor(uri, line, character)]],
+        ])
 
         logger.info("End textDocument/rename")
         return workspaceEdit
@@ -732,14 +949,10 @@ class LanguageClient:
             return symbols
 
         if state["selectionUI"] == "fzf":
-            source = []
-            for sb in symbols:
-                name = sb["name"]
-                start = sb["location"]["range"]["start"]
-                line = start["line"] + 1
-                character = start["character"] + 1
-                entry = "{}:{}:\t{}".format(line, character, name)
-                source.append(entry)
+            source = ["{}:{}:\t{}".format(
+                sb["location"]["range"]["start"]["line"] + 1,
+                sb["location"]["range"]["start"]["character"] + 1,
+                sb["name"]) for sb in symbols]
             fzf(source, "LanguageClient#FZFSinkTextDocumentDocumentSymbol")
         elif state["selectionUI"] == "location-list":
             loclist = []
@@ -860,12 +1073,13 @@ class LanguageClient:
             return locations
 
         # enhance with the line's contents for Denite
+        modified_buffers = get_modified_buffers()
         for loc in locations:
             path = uri_to_path(loc["uri"])
             start = loc["range"]["start"]
             line = start["line"] + 1
             character = start["character"] + 1
-            text = get_file_line(path, line)
+            text = get_file_line(path, line, modified_buffers)
             loc['text'] = text
 
         if not handle:
@@ -929,6 +1143,7 @@ class LanguageClient:
         if locations is None or not handle:
             return locations
 
+        modified_buffers = get_modified_buffers()
         if state["selectionUI"] == "fzf":
             source = []  # type: List[str]
             for loc in locations:
@@ -937,7 +1152,7 @@ class LanguageClient:
                 start = loc["range"]["start"]
                 line = start["line"] + 1
                 character = start["character"] + 1
-                text = get_file_line(uri_to_path(loc["uri"]), line)
+                text = get_file_line(uri_to_path(loc["uri"]), line, modified_buffers)
                 entry = "{}:{}:{}: {}".format(path, line, character, text)
                 source.append(entry)
             fzf(source, "LanguageClient#FZFSinkTextDocumentReferences")
@@ -948,7 +1163,7 @@ class LanguageClient:
                 start = loc["range"]["start"]
                 line = start["line"] + 1
                 character = start["character"] + 1
-                text = get_file_line(path, line)
+                text = get_file_line(path, line, modified_buffers)
                 loclist.append({
                     "filename": path,
                     "lnum": line,
@@ -977,20 +1192,49 @@ class LanguageClient:
         cmd = get_command_goto_file(path, bufnames, line, character)
         execute_command(cmd)
 
-    @neovim.autocmd("TextChanged", pattern="*",
-                    eval="[{'filename': expand('%:p'), 'buftype': &buftype}]")
+    @neovim.autocmd("TextChanged", pattern="*", eval=(
+        "[{'filename': expand('%:p'), 'buftype': &buftype, 'bufnr': bufnr('%'), "
+        "'changedtick': b:changedtick}]"))
     def handle_TextChanged(self, args: List) -> None:
         logger.info("Begin handle TextChanged")
         uri, buftype = gather_args(["uri", "buftype"], args=args)
         if buftype != "" or state.get(uri, {}).get("textDocument") is None:
             return
         text_doc = state[uri]["textDocument"]
+        # Changes are sent on nvim_buf_lines_event.
+        if text_doc.attached:
+            return
         if text_doc.skip_change(state["changeThreshold"]):
+            # Send the coalesced change once the burst is over.
+            if state[uri].get("changeTimer") is None:
+                set_state([uri, "changeTimer"], state["nvim"].loop.call_later(
+                    state["changeThreshold"],
+                    state["nvim"].async_call, self.flush_didChange, uri, args[0]["bufnr"]))
             return
-        self.textDocument_didChange()
+        if alive(text_doc.languageId, warn=False):
+            self.send_didChange(uri, text_doc.languageId, args[0]["changedtick"])
+
+    def flush_didChange(self, uri: str, bufnr: int) -> None:
+        """
+        Send changes of buffer skipped by changeThreshold, if still pending.
+        """
+        set_state([uri, "changeTimer"], None)
+        text_doc = state.get(uri, {}).get("textDocument")
+        if text_doc is None or not text_doc.dirty:
+            return
+        # Buffer wiped or renamed since.
+        results, error = state["nvim"].request("nvim_call_atomic", [
+            ["nvim_buf_is_valid", [bufnr]],
+            ["nvim_buf_get_name", [bufnr]],
+        ])
+        if error is not None or path_to_uri(results[1]) != uri:
+            return
+        if alive(text_doc.languageId, warn=False):
+            self.send_didChange(uri, text_doc.languageId, bufnr=bufnr)
 
-    @neovim.autocmd("TextChangedI", pattern="*",
-                    eval="[{'filename': expand('%:p'), 'buftype': &buftype}]")
+    @neovim.autocmd("TextChangedI", pattern="*", eval=(
+        "[{'filename': expand('%:p'), 'buftype': &buftype, 'bufnr': bufnr('%'), "
+        "'changedtick': b:changedtick}]"))
     def handle_TextChangedI(self, args: List) -> None:
         logger.info("Begin handle TextChangedI")
         self.handle_TextChanged(args)
@@ -1003,14 +1247,36 @@ class LanguageClient:
         if state.get(uri, {}).get("textDocument") is None:
             self.textDocument_didOpen()
             return
-        new_text = get_current_buffer_text()
+        self.send_didChange(uri, languageId)
+
+    def send_didChange(self, uri: str, languageId: str, changedtick: int = None,
+                       bufnr: int = 0) -> None:
+        """
+        Send buffer text of opened document, if changed. Current buffer by
+        default.
+
+        changedtick is b:changedtick of buffer, fetched if not given.
+        """
         doc = state[uri]["textDocument"]
+        if doc.attached:
+            return
+        # Requests like hover call didChange first. Skip fetching whole text
+        # if buffer hasn't changed since.
+        if changedtick is None:
+            changedtick = state["nvim"].request("nvim_buf_get_changedtick", bufnr)
+        if changedtick == doc.changedtick:
+            return
+        new_text = get_buffer_text(bufnr)
+        doc.changedtick = changedtick
         if new_text == doc.text:
             return
 
         logger.info("textDocument/didChange")
 
-        version, changes = doc.change(new_text)
+        capabilities = state["capabilities"].get(languageId, {})
+        incremental = (get_TextDocumentSyncKind(capabilities) ==
+                       TextDocumentSyncKind.Incremental)
+        version, changes = doc.change(new_text, incremental)
 
         state["rpcs"][languageId].notify("textDocument/didChange", {
             "textDocument": {
@@ -1022,11 +1288,44 @@ class LanguageClient:
 
         doc.commit_change()
 
+    @neovim.rpc_export("nvim_buf_lines_event")
+    def handle_nvim_buf_lines_event(self, buffer, changedtick: int, firstline: int,
+                                    lastline: int, linedata: List[str], more: bool) -> None:
+        uri = state["attachedBuffers"].get(buffer.number)
+        doc = state.get(uri, {}).get("textDocument")
+        if doc is None or not doc.attached or not alive(doc.languageId, warn=False):
+            return
+
+        logger.info("textDocument/didChange")
+
+        version, changes = doc.change_lines(firstline, lastline, linedata)
+
+        state["rpcs"][doc.languageId].notify("textDocument/didChange", {
+            "textDocument": {
+                "uri": uri,
+                "version": version
+            },
+            "contentChanges": changes
+        })
+
+    @neovim.rpc_export("nvim_buf_changedtick_event")
+    def handle_nvim_buf_changedtick_event(self, buffer, changedtick: int) -> None:
+        pass
+
+    @neovim.rpc_export("nvim_buf_detach_event")
+    def handle_nvim_buf_detach_event(self, buffer) -> None:
+        uri = state["attachedBuffers"].pop(buffer.number, None)
+        doc = state.get(uri, {}).get("textDocument")
+        # Fall back to sending full text.
+        if doc is not None:
+            doc.attached = False
+
     @neovim.autocmd("BufWritePost", pattern="*",
                     eval="[{'languageId': &filetype, 'filename': expand('%:p')}]")
     def handle_BufWritePost(self, args: List) -> None:
         logger.info("Begin handle BufWritePost")
         uri, languageId = gather_args(["uri", "languageId"], args=args)
+        self.textDocument_didChange()
         self.textDocument_didSave()
 
     @neovim.function("textDocument_didSave")
@@ -1145,6 +1444,7 @@ class LanguageClient:
         logger.info("exit")
 
         state["rpcs"][languageId].notify("exit", {})
+        state["rpcs"][languageId].close()
 
     def textDocument_publishDiagnostics(self, diagnostics_params: Dict) -> None:
         if not state["diagnosticsEnable"]:
@@ -1167,7 +1467,7 @@ class LanguageClient:
 
         set_state([uri, "line_diagnostics"], line_diagnostics)
 
-        if path_to_uri(state["nvim"].current.buffer.name) != uri:
+        if path_to_uri(state["nvim"].request("nvim_buf_get_name", 0)) != uri:
             return
 
         show_diagnostics(uri, diagnostics)
@@ -1399,8 +1699,9 @@ class LanguageClient:
             "edits": textEdits,
         }
 
-        apply_TextDocumentEdit(textDocumentEdit)
-        set_cursor(uri, line, character)
+        apply_TextDocumentEdit(textDocumentEdit, [
+            ["nvim_command", [get_command_set_cursor(uri, line, character)]],
+        ])
 
         logger.info("End textDocument/formatting")
         return textEdits
@@ -1417,8 +1718,8 @@ class LanguageClient:
             "tabSize": state["nvim"].current.buffer.options["tabstop"],
             "insertSpaces": state["nvim"].current.buffer.options["expandtab"],
         }
-        start_line = state["nvim"].eval("v:lnum") - 1
-        end_line = start_line + state["nvim"].eval("v:count")
+        start_line = state["nvim"].request("nvim_get_vvar", "lnum") - 1
+        end_line = start_line + state["nvim"].request("nvim_get_vvar", "count")
         end_char = len(state["nvim"].current.buffer[end_line]) - 1
         textRange = {
             "start": {"line": start_line, "character": 0},
@@ -1443,8 +1744,9 @@ class LanguageClient:
             "edits": textEdits,
         }
 
-        apply_TextDocumentEdit(textDocumentEdit)
-        set_cursor(uri, line, character)
+        apply_TextDocumentEdit(textDocumentEdit, [
+            ["nvim_command", [get_command_set_cursor(uri, line, character)]],
+        ])
 
         logger.info("End textDocument/rangeFormatting")
         return textEdits
@@ -1500,11 +1802,11 @@ class LanguageClient:
         # TODO: write response to server.
 
     def handle_request_and_notify(self, message: Dict) -> None:
-        method = message["method"].replace("/", "_")
-        if hasattr(self, method):
-            try:
-                state["nvim"].async_call(getattr(self, method), message.get("params"))
-            except Exception:
-                logger.exception("Exception in handle request and notify.")
-        else:
-            logger.warn("no handler implemented for " + method)
+        handler = self.handlers.get(message["method"])
+        if handler is None:
+            logger.warn("no handler implemented for " + message["method"])
+            return
+        try:
+            handler(message.get("params"))
+        except Exception:
+            logger.exception("Exception in handle request and notify.")
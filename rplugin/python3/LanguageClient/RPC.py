@@ -1,20 +1,24 @@
+import asyncio
 from collections import OrderedDict
 import json
-import time
-from typing import Dict, Any
+import logging
+from typing import Dict, Any, List, Set  # noqa: F401
 
 from . logger import logger
 
-from .state import state, suspend, wake_up, alive
+from .state import state, suspend, wake_up
+from .util import json_dumps, json_loads
 
 
 class RPC:
-    def __init__(self, infile, outfile, on_call, languageId: str) -> None:
-        self.infile = infile
+    def __init__(self, outfile, on_call, languageId: str) -> None:
         self.outfile = outfile
         self.on_call = on_call
         self.languageId = languageId
         self.mid = 0
+        self.buffer = bytearray()
+        self.content_length = None  # type: int
+        self.pending = set()  # type: Set[int]
 
     def inc_mid(self) -> int:
         mid = self.mid
@@ -22,14 +26,10 @@ class RPC:
         return mid
 
     def send_message(self, payload_dict: Dict[str, Any]) -> None:
-        payload = json.dumps(payload_dict, separators=(',', ':'))
-        message = (
-            "Content-Length: {}\r\n\r\n"
-            "{}".format(len(payload.encode("UTF-8")), payload)
-        )
-        logger.debug("=> " + payload)
-        self.outfile.write(message.encode("UTF-8"))
-        self.outfile.flush()
+        content = json_dumps(payload_dict)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("=> " + content.decode("UTF-8"))
+        self.outfile.write(b"Content-Length: %d\r\n\r\n" % len(content) + content)
 
     def call(self, method: str, params: Dict[str, Any]) -> Dict:
         """
@@ -45,6 +45,7 @@ class RPC:
 
         self.send_message(message)
 
+        self.pending.add(mid)
         return suspend(mid)
 
     def notify(self, method: str, params: Dict[str, Any]) -> None:
@@ -57,47 +58,100 @@ class RPC:
 
         self.send_message(message)
 
-    def serve(self):
-        content_length = 0
-        while not self.infile.closed:
+    def close(self) -> None:
+        """
+        Close server stdin. Servers ignoring the exit notification still see EOF.
+        """
+        self.outfile.close()
+
+    def cancel_pending(self) -> None:
+        """
+        Fail calls still waiting for a response. Runs on nvim's event loop
+        after responses already received, once server output is closed, so
+        no response can follow. Like responses, each caller is woken up from
+        a greenlet of its own.
+        """
+        for mid in sorted(self.pending):
+            self.pending.discard(mid)
+            state["nvim"].async_call(wake_up, mid, {
+                "jsonrpc": "2.0",
+                "id": mid,
+                "error": {
+                    "code": -32603,
+                    "message": "Language server exited.",
+                },
+            })
+
+    def feed(self, data: bytes) -> List[Dict[str, Any]]:
+        """
+        Consume server output. Return all complete messages in it.
+        """
+        self.buffer += data
+        messages = []  # type: List[Dict[str, Any]]
+        while True:
+            if self.content_length is None:
+                header_end = self.buffer.find(b"\r\n\r\n")
+                if header_end == -1:
+                    return messages
+                headers = bytes(self.buffer[:header_end])
+                del self.buffer[:header_end + 4]
+                for line in headers.split(b"\r\n"):
+                    header, _, value = line.partition(b":")
+                    if header.strip() == b"Content-Length":
+                        self.content_length = int(value)
+                if self.content_length is None:
+                    logger.error("Missing Content-Length header: " + str(headers))
+                    continue
+            if len(self.buffer) < self.content_length:
+                return messages
+            data = bytes(self.buffer[:self.content_length])
+            del self.buffer[:self.content_length]
+            self.content_length = None
+            message = self.decode(data)
+            if message is not None:
+                messages.append(message)
+
+    def decode(self, data: bytes) -> Dict[str, Any]:
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("<= " + data.decode("UTF-8", "replace"))
+        try:
+            return json_loads(data)
+        except Exception:
+            msg = "Error deserializing server output: " + str(data)
+            logger.exception(msg)
+            return None
+
+    def dispatch(self, messages: List[Dict[str, Any]]) -> None:
+        """
+        Schedule messages on nvim's event loop, in order.
+
+        A response resumes its caller, which then becomes a child of the
+        greenlet waking it, so each response gets a greenlet of its own.
+        Requests and notifications in a row share one.
+        """
+        batch = []  # type: List[Dict[str, Any]]
+        for message in messages:
+            if "result" in message or "error" in message:  # response
+                if len(batch) > 0:
+                    state["nvim"].async_call(self.handle_messages, batch)
+                    batch = []
+                state["nvim"].async_call(self.handle, message)
+            else:
+                batch.append(message)
+        if len(batch) > 0:
+            state["nvim"].async_call(self.handle_messages, batch)
+
+    def handle_messages(self, messages: List[Dict[str, Any]]) -> None:
+        """
+        Handle requests and notifications in order. Runs in a greenlet on
+        nvim's event loop.
+        """
+        for message in messages:
             try:
-                data = self.infile.readline()
-                line = data.decode("UTF-8").strip()
-            except UnicodeError:
-                msg = "Failed to decode message as UTF-8: " + str(data)
+                self.handle(message)
+            except Exception:
+                msg = "Error handling message: " + json.dumps(message)
                 logger.exception(msg)
-                continue
-            if line:
-                header, value = line.split(":")
-                if header == "Content-Length":
-                    content_length = int(value)
-            else:
-                try:
-                    data = self.infile.read(content_length)
-                    content = data.decode("UTF-8")
-                except UnicodeError:
-                    msg = "Failed to decode message as UTF-8: " + str(data)
-                    logger.exception(msg)
-                    continue
-                logger.debug("<= " + content)
-                try:
-                    msg = json.loads(content)
-                except Exception:
-                    msg = "Error deserializing server output: " + content
-                    logger.exception(msg)
-                    isAlive = alive(self.languageId, warn=False)
-                    if isAlive:
-                        time.sleep(1.0)
-                        continue
-                    else:
-                        msg = "Server process exited. Stopping RPC thread."
-                        logger.info(msg)
-                        break
-                try:
-                    self.handle(msg)
-                except Exception:
-                    msg = "Error handling message: " + content
-                    logger.exception(msg)
 
     def handle(self, message: Dict[str, Any]) -> None:
         if "result" in message or "error" in message:  # response
@@ -105,8 +159,41 @@ class RPC:
             if isinstance(mid, str):
                 mid = int(mid)
 
-            state["nvim"].async_call(wake_up, mid, message)
+            # Caller was woken up by cancel_pending already.
+            if mid not in self.pending:
+                return
+            self.pending.discard(mid)
+            wake_up(mid, message)
         elif "method" in message:  # request/notify
             self.on_call(message)
         else:
             logger.error("Unknown message.")
+
+
+class RPCProtocol(asyncio.SubprocessProtocol):
+    """
+    Language server process protocol. Feeds server stdout into an RPC.
+    """
+    def __init__(self, on_call, languageId: str) -> None:
+        self.on_call = on_call
+        self.languageId = languageId
+        self.rpc = None  # type: RPC
+
+    def connection_made(self, transport) -> None:
+        self.rpc = RPC(transport.get_pipe_transport(0), self.on_call, self.languageId)
+
+    def pipe_data_received(self, fd: int, data: bytes) -> None:
+        if fd != 1:
+            return
+        self.rpc.dispatch(self.rpc.feed(data))
+
+    def pipe_connection_lost(self, fd: int, exc: Exception) -> None:
+        if fd != 1:
+            return
+        # Server stdout is closed, wake up callers instead of leaving them
+        # suspended forever.
+        if len(self.rpc.pending) > 0:
+            state["nvim"].async_call(self.rpc.cancel_pending)
+
+    def process_exited(self) -> None:
+        logger.info("Server process exited. Stopping RPC.")
@@ -0,0 +1,86 @@
+import io
+
+from . import RPC as rpc_module
+from .RPC import RPC
+from .state import state
+
+
+class FakeNvim:
+    def __init__(self):
+        self.calls = []
+
+    def async_call(self, fn, *args):
+        self.calls.append((fn, args))
+
+
+def test_feed():
+    rpc = RPC(None, None, "rust")
+    payload = b'{"jsonrpc":"2.0","method":"window/logMessage","params":{}}'
+    data = b"Content-Length: " + str(len(payload)).encode() + b"\r\n\r\n" + payload
+
+    assert rpc.feed(data[:10]) == []
+    assert rpc.feed(data[10:-5]) == []
+
+    messages = rpc.feed(data[-5:] + data)
+    assert len(messages) == 2
+    assert messages[0]["method"] == "window/logMessage"
+    assert rpc.buffer == b""
+
+
+def test_dispatch(monkeypatch):
+    nvim = FakeNvim()
+    monkeypatch.setitem(state, "nvim", nvim)
+    rpc = RPC(None, None, "rust")
+    response = {"jsonrpc": "2.0", "id": 0, "result": None}
+    notifications = [
+        {"jsonrpc": "2.0", "method": "window/logMessage", "params": {}},
+        {"jsonrpc": "2.0", "method": "textDocument/publishDiagnostics", "params": {}},
+    ]
+
+    rpc.dispatch([response] + notifications)
+
+    # Response wakes up its caller in a greenlet not shared with others.
+    assert nvim.calls == [
+        (rpc.handle, (response,)),
+        (rpc.handle_messages, (notifications,)),
+    ]
+
+
+def test_send_message():
+    outfile = io.BytesIO()
+    rpc = RPC(outfile, None, "rust")
+    rpc.notify("textDocument/didSave", {"uri": "file:///tmp/é.rs"})
+
+    data = outfile.getvalue()
+    assert data.startswith(b"Content-Length: ")
+    assert rpc.feed(data)[0]["params"]["uri"] == "file:///tmp/é.rs"
+
+
+def test_close():
+    outfile = io.BytesIO()
+    rpc = RPC(outfile, None, "rust")
+    rpc.notify("exit", {})
+    rpc.close()
+
+    assert outfile.closed
+    assert rpc.pending == set()
+
+
+def test_cancel_pending(monkeypatch):
+    woken = []
+    monkeypatch.setattr(rpc_module, "wake_up",
+                        lambda mid, result: woken.append((mid, result)))
+    nvim = FakeNvim()
+    monkeypatch.setitem(state, "nvim", nvim)
+    rpc = RPC(io.BytesIO(), None, "rust")
+    rpc.pending.update([0, 1])
+
+    rpc.cancel_pending()
+    assert [(fn, args[0]) for fn, args in nvim.calls] == [
+        (rpc_module.wake_up, 0), (rpc_module.wake_up, 1)]
+    assert "error" in nvim.calls[0][1][1]
+    assert rpc.pending == set()
+
+    # Response arriving after cancellation is dropped.
+    rpc.handle({"jsonrpc": "2.0", "id": 1, "result": None})
+    assert woken == []
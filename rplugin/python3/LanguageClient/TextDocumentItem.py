@@ -8,22 +8,91 @@ class TextDocumentItem:
         self.uri = uri
         self.languageId = languageId
         self.version = 1
-        self.text = text
+        # Text and lines of document, each computed from the other on
+        # demand. Line events splice lines in place.
+        self._text = text  # type: str
+        self._lines = None  # type: List[str]
         self.last_update = time.time()
         self.dirty = True
+        # Whether changes come from nvim_buf_lines_event.
+        self.attached = False
+        # b:changedtick of buffer when text was last synced.
+        self.changedtick = None  # type: int
+
+    @property
+    def text(self) -> str:
+        if self._text is None:
+            self._text = str.join("\n", self._lines)
+        return self._text
+
+    @text.setter
+    def text(self, text: str) -> None:
+        self._text = text
+        self._lines = None
+
+    @property
+    def lines(self) -> List[str]:
+        if self._lines is None:
+            self._lines = self._text.split("\n")
+        return self._lines
 
     def incVersion(self) -> int:
         self.version += 1
         return self.version
 
-    def change(self, newText: str) -> Tuple[int, List]:
+    def change(self, newText: str, incremental: bool = False) -> Tuple[int, List]:
+        """
+        Replace text with newText. If incremental, only the changed range is
+        sent instead of full text.
+        """
         changes = []  # type: List[Dict]
-        changes.append({
-            "text": newText
-        })
+        if incremental:
+            start = common_prefix_length(self.text, newText)
+            limit = min(len(self.text), len(newText)) - start
+            suffix = common_suffix_length(self.text, newText, limit)
+            changes.append({
+                "range": {
+                    "start": get_position(self.text, start),
+                    "end": get_position(self.text, len(self.text) - suffix),
+                },
+                "text": newText[start:len(newText) - suffix],
+            })
+        else:
+            changes.append({
+                "text": newText
+            })
         self.text = newText
         return (self.incVersion(), changes)
 
+    def change_lines(self, firstline: int, lastline: int,
+                     lines: List[str]) -> Tuple[int, List]:
+        """
+        Replace lines [firstline, lastline) with lines.
+        """
+        endofline = self.lines[-1] == ""
+        if lastline < 0:
+            lastline = len(self.lines) - 1 if endofline else len(self.lines)
+        # Without trailing newline, end of last line can't be addressed as
+        # start of next line.
+        full = not endofline and lastline == len(self.lines)
+        self.lines[firstline:lastline] = lines
+        self._text = None
+
+        changes = []  # type: List[Dict]
+        if full:
+            changes.append({
+                "text": self.text,
+            })
+        else:
+            changes.append({
+                "range": {
+                    "start": {"line": firstline, "character": 0},
+                    "end": {"line": lastline, "character": 0},
+                },
+                "text": str.join("", [line + "\n" for line in lines]),
+            })
+        return (self.incVersion(), changes)
+
     def skip_change(self, threshold: float = 0.5):
         if time.time() - self.last_update < threshold:
             self.dirty = True
@@ -36,3 +105,45 @@ class TextDocumentItem:
 
     def __str__(self) -> str:
         return json.dumps(self.__dict__)
+
+
+def common_prefix_length(a: str, b: str) -> int:
+    """
+    Length of common prefix of a and b.
+
+    Binary search with slice comparisons, which run in C rather than one
+    python iteration per character. Each step only compares the undecided
+    window, so total work stays linear.
+    """
+    lo, hi = 0, min(len(a), len(b))
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if a[lo:mid] == b[lo:mid]:
+            lo = mid
+        else:
+            hi = mid - 1
+    return lo
+
+
+def common_suffix_length(a: str, b: str, limit: int) -> int:
+    """
+    Length of common suffix of a and b, up to limit.
+    """
+    lo, hi = 0, limit
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if a[len(a) - mid:len(a) - lo] == b[len(b) - mid:len(b) - lo]:
+            lo = mid
+        else:
+            hi = mid - 1
+    return lo
+
+
+def get_position(text: str, offset: int) -> Dict:
+    """
+    Convert offset in text into LSP Position.
+    """
+    return {
+        "line": text.count("\n", 0, offset),
+        "character": offset - text.rfind("\n", 0, offset) - 1,
+    }
@@ -1,4 +1,5 @@
-from . TextDocumentItem import TextDocumentItem
+from . TextDocumentItem import (
+    TextDocumentItem, common_prefix_length, common_suffix_length)
 
 
 def test_TextDocumentItem():
@@ -37,3 +38,86 @@ fn main() {
     assert textDocumentItem.text == newText
     assert version == 2
     assert len(changes) == 1
+
+
+def test_TextDocumentItem_change_lines():
+    textDocumentItem = TextDocumentItem(
+        "file:///tmp/sample.rs", "rust", "fn main() {\n}\n")
+
+    version, changes = textDocumentItem.change_lines(1, 1, ["    let a = 1;"])
+
+    assert version == 2
+    assert textDocumentItem.text == "fn main() {\n    let a = 1;\n}\n"
+    assert changes == [{
+        "range": {
+            "start": {"line": 1, "character": 0},
+            "end": {"line": 1, "character": 0},
+        },
+        "text": "    let a = 1;\n",
+    }]
+
+    version, changes = textDocumentItem.change_lines(1, 2, [])
+
+    assert version == 3
+    assert textDocumentItem.text == "fn main() {\n}\n"
+    assert changes[0]["text"] == ""
+
+
+def test_TextDocumentItem_change_lines_noeol():
+    textDocumentItem = TextDocumentItem(
+        "file:///tmp/sample.rs", "rust", "fn main() {\n}")
+
+    version, changes = textDocumentItem.change_lines(1, 2, ["}", ""])
+
+    assert textDocumentItem.text == "fn main() {\n}\n"
+    assert changes == [{"text": "fn main() {\n}\n"}]
+
+
+def test_TextDocumentItem_change_lines_after_change():
+    textDocumentItem = TextDocumentItem(
+        "file:///tmp/sample.rs", "rust", "fn main() {\n}\n")
+
+    textDocumentItem.change_lines(1, 1, ["    let a = 1;"])
+    textDocumentItem.change_lines(1, 2, ["    let b = 1;"])
+    assert textDocumentItem.lines == ["fn main() {", "    let b = 1;", "}", ""]
+
+    textDocumentItem.change("fn main() {\n}\n")
+    textDocumentItem.change_lines(0, 1, ["fn f() {"])
+    assert textDocumentItem.text == "fn f() {\n}\n"
+
+
+def test_TextDocumentItem_change_incremental():
+    textDocumentItem = TextDocumentItem(
+        "file:///tmp/sample.rs", "rust", "fn main() {\n    let a = 1;\n}\n")
+
+    version, changes = textDocumentItem.change(
+        "fn main() {\n    let abc = 1;\n}\n", incremental=True)
+
+    assert version == 2
+    assert textDocumentItem.text == "fn main() {\n    let abc = 1;\n}\n"
+    assert changes == [{
+        "range": {
+            "start": {"line": 1, "character": 9},
+            "end": {"line": 1, "character": 9},
+        },
+        "text": "bc",
+    }]
+
+    version, changes = textDocumentItem.change("fn main() {\n}\n", incremental=True)
+
+    assert changes == [{
+        "range": {
+            "start": {"line": 1, "character": 0},
+            "end": {"line": 2, "character": 0},
+        },
+        "text": "",
+    }]
+
+
+def test_common_prefix_suffix_length():
+    assert common_prefix_length("abcdef", "abcxef") == 3
+    assert common_prefix_length("abc", "abcdef") == 3
+    assert common_prefix_length("", "abc") == 0
+    assert common_suffix_length("abcdef", "abcxef", 3) == 2
+    assert common_suffix_length("aaa", "aaaa", 0) == 0
+    assert common_suffix_length("xaaa", "aaaa", 4) == 3
@@ -0,0 +1,7 @@
+from enum import Enum
+
+
+class TextDocumentSyncKind(Enum):
+    None_ = 0
+    Full = 1
+    Incremental = 2
@@ -1,3 +1,4 @@
+import asyncio
 import greenlet
 import json
 from typing import Dict, Any, List
@@ -9,11 +10,18 @@ from .MessageType import MessageType
 
 state = {
     "nvim": None,
-    "servers": {},  # Dict[str, subprocess.Popen]. language id to subprocess.
+    "servers": {},  # Dict[str, asyncio.SubprocessTransport]. language id to subprocess.
     "rpcs": {},  # Dict[str, RPC]. language id to RPC instance.
     "handlers": {},  # Dict[int, PyGreenlet]. message id to greenlet.
     "capabilities": {},  # Dict[str, Dict]. language id to capabilities.
     "rootUris": {},  # Dict[str, str]. language id to rootUri.
+    "attachedBuffers": {},  # Dict[int, str]. buffer number to uri.
+    "hasBufSetText": None,  # Whether nvim_buf_set_text is available.
+
+    # Dict[int, Dict[str, Any]]. buffer number to bufnr, buftype, languageId
+    # and filename of the buffer.
+    "buffers": {},
+    "currentBufnr": None,  # Buffer number of current buffer.
 
     "last_cursor_line": -1,
     "last_line_diagnostic": "",
@@ -120,6 +128,24 @@ def wake_up(mid: int, result: Any) -> None:
     handler.switch(result)
 
 
+def wait_for(coro) -> Any:
+    """
+    Run coroutine on nvim's event loop. Suspend current greenlet until it is
+    done.
+    """
+    gr = greenlet.getcurrent()
+    future = asyncio.ensure_future(coro, loop=state["nvim"].loop)
+    future.add_done_callback(
+        lambda future: state["nvim"].async_call(resume, gr))
+    gr.parent.switch()
+    return future.result()
+
+
+def resume(gr: greenlet.greenlet) -> None:
+    gr.parent = greenlet.getcurrent()
+    gr.switch()
+
+
 def handle_error(response: Dict) -> bool:
     if "error" in response:
         logger.error(str(response))
@@ -134,6 +160,21 @@ def execute_command(command: str) -> None:
     state["nvim"].command(command)
 
 
+def call_atomic(calls: List, warn: bool = False) -> None:
+    """
+    Execute a batch of nvim API calls in a single request. Errors are logged,
+    and echoed too if warn, for batches the user is waiting on.
+    """
+    if len(calls) == 0:
+        return
+    _, error = state["nvim"].request("nvim_call_atomic", calls)
+    if error is not None:
+        msg = "nvim_call_atomic failed: " + str(error)
+        logger.error(msg)
+        if warn:
+            echoerr(msg)
+
+
 def echo(message: str) -> None:
     """Echo message."""
     message = escape(message)
@@ -189,7 +230,7 @@ def alive(languageId: str, warn: bool) -> bool:
     msg = None
     if state["servers"].get(languageId) is None:
         msg = "Language client is not running. Try :LanguageClientStart"
-    elif state["servers"][languageId].poll() is not None:
+    elif state["servers"][languageId].get_returncode() is not None:
         msg = "Failed to start language server. See {}.".format(logpath_server)
     if msg and warn:
         logger.warn(msg)
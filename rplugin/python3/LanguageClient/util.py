@@ -2,6 +2,7 @@ import os
 import time
 import glob
 import difflib
+import json
 from urllib import parse
 from urllib import request
 from pathlib import Path
@@ -12,6 +13,12 @@ import re
 from . logger import logger
 from . Sign import Sign
 from .CompletionItemKind import convert_CompletionItemKind_to_vim_kind
+from .TextDocumentSyncKind import TextDocumentSyncKind
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
@@ -109,7 +116,27 @@ def uri_to_path(uri: str) -> str:
     return request.url2pathname(parse.urlparse(uri).path)
 
 
+def json_dumps(obj: Any) -> bytes:
+    """
+    Serialize obj into compact UTF-8 encoded JSON. Use orjson if available.
+    """
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, separators=(",", ":"), ensure_ascii=False).encode("UTF-8")
+
+
+def json_loads(data: bytes) -> Any:
+    """
+    Deserialize UTF-8 encoded JSON. Use orjson if available.
+    """
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data.decode("UTF-8"))
+
+
 def escape(string: str) -> str:
+    # Single str.replace beats str.translate with a multi-char mapping by
+    # an order of magnitude.
     return string.replace("'", "''")
 
 
@@ -127,6 +154,10 @@ def get_command_goto_file(path, bufnames, l, c) -> str:
         return "exe 'edit +:call\\ cursor({},{}) ' . fnameescape('{}')".format(l, c, path)
 
 
+def get_command_set_cursor(uri: str, line: int, character: int) -> str:
+    return "buffer {} | normal! {}G{}|".format(uri_to_path(uri), line + 1, character + 1)
+
+
 def get_command_delete_sign(sign: Sign, filename: str) -> str:
     return " | execute 'sign unplace {} file={}'".format(
         sign.id, filename)
@@ -188,6 +219,95 @@ def apply_TextEdit(text_list: List[str], textEdit: Dict) -> List[str]:
     return text.split("\n")
 
 
+def read_file_lines(filepath: str) -> List[str]:
+    """
+    Read file into lines as a loaded buffer would hold them, i.e., without the
+    trailing newline.
+
+    Raise UnicodeDecodeError if file is not UTF-8, as byte columns computed
+    from the lines would not match the buffer.
+
+    Like nvim with default 'fileformats', a BOM is not part of the text, lines
+    are split on newlines only, and carriage returns before them are dropped
+    only if every line ends with CRLF.
+    """
+    with open(filepath, encoding="utf-8-sig", newline="") as f:
+        text = f.read()
+    lines = text.split("\n")
+    # Last item is what follows the last newline.
+    ended, rest = lines[:-1], lines[-1]
+    if len(ended) > 0 and all(line.endswith("\r") for line in ended):
+        ended = [line[:-1] for line in ended]
+    if rest == "" and len(ended) > 0:
+        return ended
+    return ended + [rest]
+
+
+def get_TextDocumentSyncKind(capabilities: Dict) -> TextDocumentSyncKind:
+    textDocumentSync = capabilities.get("textDocumentSync")
+    if isinstance(textDocumentSync, dict):
+        textDocumentSync = textDocumentSync.get("change")
+    if textDocumentSync is None:
+        return TextDocumentSyncKind.None_
+    return TextDocumentSyncKind(textDocumentSync)
+
+
+def convert_TextEdit_to_buf_set_text_args(text_list: List[str], textEdit: Dict) -> List:
+    """
+    Convert a TextEdit into nvim_buf_set_text arguments following the buffer,
+    i.e., start_row, start_col, end_row, end_col and replacement lines.
+
+    Columns are converted into bytes. Trailing newline of buffer is implicit,
+    so positions past the last line (end of text) are mapped to end of last
+    line, and the edit adjusted to keep or drop that newline.
+    """
+    newText = textEdit["newText"]
+    last_line = len(text_list) - 1
+
+    def clamp(position: Dict) -> Dict:
+        # Character past end of line means end of line.
+        line = position["line"]
+        if line > last_line:
+            return position
+        return {
+            "line": line,
+            "character": min(position["character"], len(text_list[line])),
+        }
+
+    start = clamp(textEdit["range"]["start"])
+    end = clamp(textEdit["range"]["end"])
+    end_of_text = [last_line, len(text_list[last_line].encode("UTF-8"))]
+
+    def to_row_col(position: Dict) -> List[int]:
+        line = position["line"]
+        return [line, len(text_list[line][:position["character"]].encode("UTF-8"))]
+
+    if end["line"] <= last_line:
+        positions = to_row_col(start) + to_row_col(end)
+    elif start["line"] > last_line:
+        # Append after trailing newline.
+        if newText == "":
+            positions = end_of_text + end_of_text
+        else:
+            if newText.endswith("\n"):
+                newText = newText[:-1]
+            newText = "\n" + newText
+            positions = end_of_text + end_of_text
+    else:
+        # Replace until end of text, trailing newline included.
+        if newText.endswith("\n"):
+            newText = newText[:-1]
+            positions = to_row_col(start) + end_of_text
+        elif newText == "" and start["character"] == 0 and start["line"] > 0:
+            # Deleting whole last lines. Delete newline before them instead.
+            positions = [start["line"] - 1,
+                         len(text_list[start["line"] - 1].encode("UTF-8"))] + end_of_text
+        else:
+            positions = to_row_col(start) + end_of_text
+
+    return positions + [newText.split("\n")]
+
+
 def markedString_to_str(s: Any) -> str:
     if isinstance(s, str):
         # Roughly convert markdown to plain text.
@@ -1,10 +1,17 @@
+import os
+import tempfile
+
+import pytest
+
 from . util import (
     join_path, get_rootPath, path_to_uri, uri_to_path, escape,
-    get_command_goto_file,
+    get_command_goto_file, get_command_set_cursor,
     get_command_add_sign, get_command_delete_sign, get_command_update_signs,
-    convert_vim_command_args_to_kwargs, apply_TextEdit)
+    convert_vim_command_args_to_kwargs, apply_TextEdit, get_TextDocumentSyncKind,
+    json_dumps, json_loads, convert_TextEdit_to_buf_set_text_args, read_file_lines)
 from .Sign import Sign
 from .DiagnosticSeverity import DiagnosticSeverity
+from .TextDocumentSyncKind import TextDocumentSyncKind
 
 
 def test_getRootPath():
@@ -32,8 +39,16 @@ def test_uriToPath_quoted():
             "/tmp/node_modules/@types/node/index.d.ts")
 
 
+def test_json():
+    obj = {"uri": "file:///tmp/é.rs", "items": [1, None, True]}
+    assert json_loads(json_dumps(obj)) == obj
+    assert b" " not in json_dumps(obj)
+
+
 def test_escape():
     assert escape("my' precious") == "my'' precious"
+    assert escape("'my' 'precious'") == "''my'' ''precious''"
+    assert escape("precious") == "precious"
 
 
 def test_getGotoFileCommand():
@@ -48,6 +63,11 @@ def test_getGotoFileCommand():
     ], 3, 4) == "exe 'edit +:call\\ cursor(3,4) ' . fnameescape('/tmp/+some str%nge|name')"
 
 
+def test_getCommandSetCursor():
+    assert (get_command_set_cursor("file:///tmp/sample.rs", 0, 4) ==
+            "buffer /tmp/sample.rs | normal! 1G5|")
+
+
 def test_getCommandDeleteSign():
     sign = Sign(1, DiagnosticSeverity.Error)
     assert get_command_delete_sign(sign, "") == " | execute 'sign unplace 75000 file='"
@@ -131,3 +151,118 @@ def test_apply_TextEdit():
         "newText": newText,
     }
     assert apply_TextEdit(text, textEdit) == expectedText
+
+
+def test_get_TextDocumentSyncKind():
+    assert get_TextDocumentSyncKind({}) == TextDocumentSyncKind.None_
+    assert get_TextDocumentSyncKind({
+        "textDocumentSync": 1,
+    }) == TextDocumentSyncKind.Full
+    assert get_TextDocumentSyncKind({
+        "textDocumentSync": {
+            "openClose": True,
+            "change": 2,
+        },
+    }) == TextDocumentSyncKind.Incremental
+
+
+def test_convert_TextEdit_to_buf_set_text_args():
+    text_list = ["let café = 1;", "println!(café);"]
+
+    assert convert_TextEdit_to_buf_set_text_args(text_list, {
+        "range": {
+            "start": {"line": 1, "character": 9},
+            "end": {"line": 1, "character": 13},
+        },
+        "newText": "tea",
+    }) == [1, 9, 1, 14, ["tea"]]
+
+    assert convert_TextEdit_to_buf_set_text_args(text_list, {
+        "range": {
+            "start": {"line": 0, "character": 0},
+            "end": {"line": 2, "character": 0},
+        },
+        "newText": "let a = 1;\n",
+    }) == [0, 0, 1, 16, ["let a = 1;"]]
+
+    assert convert_TextEdit_to_buf_set_text_args(text_list, {
+        "range": {
+            "start": {"line": 2, "character": 0},
+            "end": {"line": 2, "character": 0},
+        },
+        "newText": "}\n",
+    }) == [1, 16, 1, 16, ["", "}"]]
+
+
+def test_convert_TextEdit_to_buf_set_text_args_end_of_text():
+    # Delete last line.
+    assert convert_TextEdit_to_buf_set_text_args(["a", "b"], {
+        "range": {
+            "start": {"line": 1, "character": 0},
+            "end": {"line": 2, "character": 0},
+        },
+        "newText": "",
+    }) == [0, 1, 1, 1, [""]]
+
+    # Delete trailing blank line.
+    assert convert_TextEdit_to_buf_set_text_args(["a", ""], {
+        "range": {
+            "start": {"line": 1, "character": 0},
+            "end": {"line": 2, "character": 0},
+        },
+        "newText": "",
+    }) == [0, 1, 1, 0, [""]]
+
+    # Delete last line, with characters past end of line.
+    assert convert_TextEdit_to_buf_set_text_args(["a", ""], {
+        "range": {
+            "start": {"line": 1, "character": 1},
+            "end": {"line": 2, "character": 1},
+        },
+        "newText": "",
+    }) == [0, 1, 1, 0, [""]]
+
+    assert convert_TextEdit_to_buf_set_text_args(["abc", "d"], {
+        "range": {
+            "start": {"line": 0, "character": 1},
+            "end": {"line": 0, "character": 10},
+        },
+        "newText": "",
+    }) == [0, 1, 0, 3, [""]]
+
+    # Empty insert at end of text.
+    assert convert_TextEdit_to_buf_set_text_args(["a", "b"], {
+        "range": {
+            "start": {"line": 2, "character": 0},
+            "end": {"line": 2, "character": 0},
+        },
+        "newText": "",
+    }) == [1, 1, 1, 1, [""]]
+
+
+def test_read_file_lines():
+    with tempfile.NamedTemporaryFile("w", suffix=".rs", delete=False) as f:
+        f.write("fn main() {\r\n}\r\n")
+    assert read_file_lines(f.name) == ["fn main() {", "}"]
+
+    with open(f.name, "w") as f:
+        f.write("")
+    assert read_file_lines(f.name) == [""]
+
+    with open(f.name, "wb") as f:
+        f.write(b"\xef\xbb\xbffn main() {\r\n}\r\n")
+    assert read_file_lines(f.name) == ["fn main() {", "}"]
+
+    with open(f.name, "wb") as f:
+        f.write(b"fn main() {\r\n}\n")
+    assert read_file_lines(f.name) == ["fn main() {\r", "}"]
+
+    with open(f.name, "wb") as f:
+        f.write(b"a\rb\nc\n")
+    assert read_file_lines(f.name) == ["a\rb", "c"]
+
+    with open(f.name, "wb") as f:
+        f.write("let café = 1;\n".encode("latin-1"))
+    with pytest.raises(UnicodeDecodeError):
+        read_file_lines(f.name)
+    os.remove(f.name)
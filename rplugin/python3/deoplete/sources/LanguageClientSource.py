@@ -1,7 +1,7 @@
 import re
 import sys
 from os import path
-from typing import Dict
+from typing import Dict, List, Union  # noqa: F401
 
 from .base import Base
 
@@ -53,16 +53,42 @@ class Source(Base):
         self.filetypes = state["serverCommands"].keys()
         self.min_pattern_length = 1
         self.input_pattern = r'(\.|::)\w*'
+        self.request_id = 0
+        self.result = None  # type: Union[List, Dict]
 
         logger.info("deoplete LanguageClientSource initialized.")
 
     def gather_candidates(self, context):
-        # context["is_async"] = True
+        if not context["is_async"]:
+            languageId = context["filetypes"][0]
+            line = context["position"][1] - 1
+            character = context["position"][2] - 1
+
+            # Don't block deoplete while the server computes completions.
+            # Ask for them in a separate greenlet; deoplete polls again.
+            self.request_id += 1
+            self.result = None
+            self.vim.async_call(self.request_completion, self.request_id,
+                                languageId, line, character)
+            context["is_async"] = True
+            return []
+
+        if self.result is None:
+            return []
 
-        languageId = context["filetypes"][0]
-        line = context["position"][1] - 1
-        character = context["position"][2] - 1
+        context["is_async"] = False
+        result = self.result
+        self.result = None
+
+        if isinstance(result, dict):
+            items = result["items"]
+        else:
+            items = result
+
+        return [convert_to_deoplete_candidate(item) for item in items]
 
+    def request_completion(self, request_id: int, languageId: str,
+                           line: int, character: int) -> None:
         try:
             result = LanguageClient._instance.textDocument_completion(
                 languageId=languageId, line=line, character=character)
@@ -70,11 +96,10 @@ class Source(Base):
             result = []
             logger.error("Failed to get completion")
 
-        if result is None:
-            return []
-        elif isinstance(result, dict):
-            items = result["items"]
-        else:
-            items = result
+        # Outdated by a newer request.
+        if request_id != self.request_id:
+            return
 
-        return [convert_to_deoplete_candidate(item) for item in items]
+        if result is None:
+            result = []
+        self.result = result